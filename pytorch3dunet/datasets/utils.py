@@ -216,12 +216,15 @@ def get_train_loaders(config):
         batch_size = batch_size * torch.cuda.device_count()
 
     logger.info(f'Batch size for train/val loader: {batch_size}')
+    # page-locked batches allow asynchronous (non_blocking) host to GPU copies in the trainer
+    pin_memory = config['device'].type == 'cuda'
     # when training with volumetric data use batch_size of 1 due to GPU memory constraints
     return {
         'train': DataLoader(ConcatDataset(train_datasets), batch_size=batch_size, shuffle=True,
-                            num_workers=num_workers),
+                            num_workers=num_workers, pin_memory=pin_memory),
         # don't shuffle during validation: useful when showing how predictions for a given batch get better over time
-        'val': DataLoader(ConcatDataset(val_datasets), batch_size=batch_size, shuffle=False, num_workers=num_workers)
+        'val': DataLoader(ConcatDataset(val_datasets), batch_size=batch_size, shuffle=False, num_workers=num_workers,
+                          pin_memory=pin_memory)
     }
 
 
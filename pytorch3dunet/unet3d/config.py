@@ -1,4 +1,8 @@
 import argparse
+import json
+import mmap
+import os
+import stat
 
 import torch
 import yaml
@@ -8,11 +12,22 @@ from pytorch3dunet.unet3d import utils
 logger = utils.get_logger('ConfigLoader')
 
 
+class _YamlLoader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+    """
+    Safe YAML loader using the libyaml C bindings if PyYAML was built against them (pure-Python loader otherwise).
+    Timestamps are not resolved implicitly (configs don't use them), which saves a regex match on every scalar.
+    """
+    yaml_implicit_resolvers = {
+        first_char: [(tag, regexp) for tag, regexp in resolvers if tag != 'tag:yaml.org,2002:timestamp']
+        for first_char, resolvers in yaml.SafeLoader.yaml_implicit_resolvers.items()
+    }
+
+
 def load_config():
     parser = argparse.ArgumentParser(description='UNet3D')
     parser.add_argument('--config', type=str, help='Path to the YAML config file', required=True)
     args = parser.parse_args()
-    config = yaml.safe_load(open(args.config, 'r'))
+    config = _load_config_cached(args.config)
     # Get a device to train on
     device_str = config.get('device', None)
     if device_str is not None:
@@ -30,4 +45,44 @@ def load_config():
 
 
 def _load_config_yaml(config_file):
-    return yaml.safe_load(open(config_file, 'r'))
+    with open(config_file, 'rb') as f:
+        file_stat = os.fstat(f.fileno())
+        if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size == 0:
+            # pipes (e.g. process substitution) and empty files cannot be memory-mapped, read them as a stream
+            return yaml.load(f, Loader=_YamlLoader)
+        # let the parser scan the mapped file directly instead of copying it into a read buffer first
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return yaml.load(mm, Loader=_YamlLoader)
+
+
+def _load_config_cached(config_file):
+    """
+    Loads the YAML config via a JSON sidecar cache (`<config_file>.cache.json`), which is much faster to parse.
+    The cache stores the modification time (ns) and size of the YAML file it was built from and is rebuilt
+    whenever either of them differs. Non-regular files (e.g. `/dev/stdin`, process substitution) are never cached.
+    """
+    file_stat = os.stat(config_file)
+    if not stat.S_ISREG(file_stat.st_mode):
+        return _load_config_yaml(config_file)
+
+    cache_file = config_file + '.cache.json'
+    source = {'mtime_ns': file_stat.st_mtime_ns, 'size': file_stat.st_size}
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+        if cache['source'] == source:
+            return cache['config']
+    except (OSError, ValueError, TypeError, KeyError):
+        # cache missing, unreadable or corrupted: fall back to parsing the YAML
+        pass
+
+    config = _load_config_yaml(config_file)
+    try:
+        serialized = json.dumps({'source': source, 'config': config})
+        # only cache configs which survive the JSON round trip unchanged (e.g. no integer keys)
+        if json.loads(serialized)['config'] == config:
+            with open(cache_file, 'w') as f:
+                f.write(serialized)
+    except (OSError, TypeError, ValueError):
+        logger.warning(f"Could not cache config '{config_file}'")
+    return config
@@ -3,11 +3,9 @@ import os
 import torch
 import torch.nn as nn
 from torch.optim.lr_scheduler import ReduceLROnPlateau
-from torch.utils.tensorboard import SummaryWriter
 
 from pytorch3dunet.datasets.utils import get_train_loaders
 from pytorch3dunet.unet3d.losses import get_loss_criterion
-from pytorch3dunet.unet3d.metrics import get_evaluation_metric
 from pytorch3dunet.unet3d.model import get_model
 from pytorch3dunet.unet3d.utils import get_logger, get_tensorboard_formatter, create_optimizer, \
     create_lr_scheduler, get_number_of_learnable_parameters
@@ -29,12 +27,25 @@ def create_trainer(config):
     logger.info(f"Sending the model to '{config['device']}'")
     model = model.to(device)
 
+    if device.type == 'cuda':
+        # allow TF32 math on Ampere+ GPUs
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        if hasattr(torch, 'set_float32_matmul_precision'):
+            torch.set_float32_matmul_precision('high')
+        # patch shapes are fixed, so let cuDNN pick the fastest convolution algorithms;
+        # autotuning is non-deterministic, skip it if deterministic mode was requested (see `manual_seed`)
+        if not torch.backends.cudnn.deterministic:
+            logger.info('Enabling cuDNN benchmark mode')
+            torch.backends.cudnn.benchmark = True
+
     # Log the number of learnable parameters
     logger.info(f'Number of learnable params {get_number_of_learnable_parameters(model)}')
 
     # Create loss criterion
     loss_criterion = get_loss_criterion(config)
-    # Create evaluation metric
+    # Create evaluation metric (imported lazily, pulls in scikit-image)
+    from pytorch3dunet.unet3d.metrics import get_evaluation_metric
     eval_criterion = get_evaluation_metric(config)
 
     # Create data loaders
@@ -96,6 +107,8 @@ class UNet3DTrainer:
             that can be displayed in tensorboard
         skip_train_validation (bool): if True eval_criterion is not evaluated on the training set (used mostly when
             evaluation is expensive)
+        compile_forward (bool): if True the forward pass and the loss computation are compiled into a single graph
+            with `torch.compile` (requires PyTorch 2.0+)
     """
 
     def __init__(self, model, optimizer, lr_scheduler, loss_criterion,
@@ -105,7 +118,7 @@ class UNet3DTrainer:
                  validate_iters=None, num_iterations=1, num_epoch=0,
                  eval_score_higher_is_better=True,
                  tensorboard_formatter=None, skip_train_validation=False,
-                 resume=None, pre_trained=None, **kwargs):
+                 resume=None, pre_trained=None, compile_forward=False, **kwargs):
 
         self.model = model
         self.optimizer = optimizer
@@ -131,7 +144,9 @@ class UNet3DTrainer:
         else:
             self.best_eval_score = float('+inf')
 
-        self.writer = SummaryWriter(log_dir=os.path.join(checkpoint_dir, 'logs'))
+        # the tensorboard writer is created on first use, see `writer`
+        self._log_dir = os.path.join(checkpoint_dir, 'logs')
+        self._writer = None
 
         assert tensorboard_formatter is not None, 'TensorboardFormatter must be provided'
         self.tensorboard_formatter = tensorboard_formatter
@@ -140,6 +155,17 @@ class UNet3DTrainer:
         self.num_epochs = num_epoch
         self.skip_train_validation = skip_train_validation
 
+        self._step = self._forward_pass
+        if compile_forward:
+            if hasattr(torch, 'compile'):
+                logger.info('Compiling the forward pass with torch.compile')
+                # default mode on purpose: 'reduce-overhead' replays CUDA graphs which overwrite the outputs
+                # of the previous run, while the training output is still used after validating (eval/log images)
+                self._step = torch.compile(self._forward_pass, dynamic=False)
+            else:
+                logger.warning(f'torch.compile is not available in PyTorch {torch.__version__}. '
+                               f'Using eager forward pass')
+
         if resume is not None:
             logger.info(f"Loading checkpoint '{resume}'...")
             state = utils.load_checkpoint(resume, self.model, self.optimizer)
@@ -157,17 +183,31 @@ class UNet3DTrainer:
             if 'checkpoint_dir' not in kwargs:
                 self.checkpoint_dir = os.path.split(pre_trained)[0]
 
-    def fit(self):
-        for _ in range(self.num_epochs, self.max_num_epochs):
-            # train for one epoch
-            should_terminate = self.train()
-
-            if should_terminate:
-                logger.info('Stopping criterion is satisfied. Finishing training')
-                return
+    @property
+    def writer(self):
+        if self._writer is None:
+            # tensorboard is slow to import, defer it until something is actually logged
+            from torch.utils.tensorboard import SummaryWriter
+            self._writer = SummaryWriter(log_dir=self._log_dir, max_queue=1000)
+        return self._writer
 
-            self.num_epochs += 1
-        logger.info(f"Reached maximum number of epochs: {self.max_num_epochs}. Finishing training...")
+    def fit(self):
+        try:
+            for _ in range(self.num_epochs, self.max_num_epochs):
+                # train for one epoch
+                should_terminate = self.train()
+
+                if should_terminate:
+                    logger.info('Stopping criterion is satisfied. Finishing training')
+                    return
+
+                self.num_epochs += 1
+            logger.info(f"Reached maximum number of epochs: {self.max_num_epochs}. Finishing training...")
+        finally:
+            # flush the events still queued in the writer
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
 
     def train(self):
         """Trains the model for 1 epoch.
@@ -175,24 +215,29 @@ class UNet3DTrainer:
         Returns:
             True if the training should be terminated immediately, False otherwise
         """
-        train_losses = utils.RunningAverage()
+        # accumulate the training loss on the device, so that reading it back (host sync) happens only when logging
+        train_loss_sum = torch.zeros((), device=self.device)
+        train_loss_count = 0
         train_eval_scores = utils.RunningAverage()
 
         # sets the model in training mode
         self.model.train()
 
         for t in self.loaders['train']:
-            logger.info(f'Training iteration [{self.num_iterations}/{self.max_num_iterations}]. '
-                        f'Epoch [{self.num_epochs}/{self.max_num_epochs - 1}]')
+            if self.num_iterations % self.log_after_iters == 0:
+                logger.info('Training iteration [%d/%d]. Epoch [%d/%d]', self.num_iterations,
+                            self.max_num_iterations, self.num_epochs, self.max_num_epochs - 1)
 
             input, target, weight = self._split_training_batch(t)
 
-            output, loss = self._forward_pass(input, target, weight)
+            output, loss = self._step(input, target, weight)
 
-            train_losses.update(loss.item(), self._batch_size(input))
+            batch_size = self._batch_size(input)
+            train_loss_sum += loss.detach().float() * batch_size
+            train_loss_count += batch_size
 
             # compute gradients and update parameters
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
             self.optimizer.step()
 
@@ -224,9 +269,10 @@ class UNet3DTrainer:
                     train_eval_scores.update(eval_score.item(), self._batch_size(input))
 
                 # log stats, params and images
+                train_loss_avg = (train_loss_sum / train_loss_count).item()
                 logger.info(
-                    f'Training stats. Loss: {train_losses.avg}. Evaluation score: {train_eval_scores.avg}')
-                self._log_stats('train', train_losses.avg, train_eval_scores.avg)
+                    f'Training stats. Loss: {train_loss_avg}. Evaluation score: {train_eval_scores.avg}')
+                self._log_stats('train', train_loss_avg, train_eval_scores.avg)
                 self._log_params()
                 self._log_images(input, target, output, 'train_')
 
@@ -266,7 +312,7 @@ class UNet3DTrainer:
 
                 input, target, weight = self._split_training_batch(t)
 
-                output, loss = self._forward_pass(input, target, weight)
+                output, loss = self._step(input, target, weight)
                 val_losses.update(loss.item(), self._batch_size(input))
 
                 if i % 100 == 0:
@@ -284,13 +330,13 @@ class UNet3DTrainer:
             return val_scores.avg
 
     def _split_training_batch(self, t):
-        def _move_to_device(input):
-            if isinstance(input, tuple) or isinstance(input, list):
-                return tuple([_move_to_device(x) for x in input])
-            else:
-                return input.to(self.device)
-
-        t = _move_to_device(t)
+        device = self.device
+        # batches come from pinned memory (see `get_train_loaders`), so the copies can be issued asynchronously
+        t = tuple(
+            tuple(x.to(device, non_blocking=True) for x in input) if isinstance(input, (tuple, list))
+            else input.to(device, non_blocking=True)
+            for input in t
+        )
         weight = None
         if len(t) == 2:
             input, target = t
@@ -356,9 +402,19 @@ class UNet3DTrainer:
 
     def _log_params(self):
         logger.info('Logging model parameters and gradients')
+        tags = []
+        samples = []
         for name, value in self.model.named_parameters():
-            self.writer.add_histogram(name, value.data.cpu().numpy(), self.num_iterations)
-            self.writer.add_histogram(name + '/grad', value.grad.data.cpu().numpy(), self.num_iterations)
+            tags.append(name)
+            samples.append(self._histogram_sample(value))
+            if value.grad is not None:
+                tags.append(name + '/grad')
+                samples.append(self._histogram_sample(value.grad))
+
+        # copy all the samples to the host in a single transfer and split them back per tag
+        samples = torch.cat(samples).cpu().split([len(sample) for sample in samples])
+        for tag, sample in zip(tags, samples):
+            self.writer.add_histogram(tag, sample.numpy(), self.num_iterations)
 
     def _log_images(self, input, target, prediction, prefix=''):
         if self.model.training:
@@ -387,6 +443,13 @@ class UNet3DTrainer:
             for tag, image in self.tensorboard_formatter(name, batch):
                 self.writer.add_image(prefix + tag, image, self.num_iterations)
 
+    @staticmethod
+    def _histogram_sample(value, max_samples=10000):
+        # subsample large tensors on the device so that at most `max_samples` values are copied to the host
+        value = value.detach().flatten().float()
+        stride = max(1, -(-value.numel() // max_samples))
+        return value[::stride]
+
     @staticmethod
     def _batch_size(input):
         if isinstance(input, list) or isinstance(input, tuple):
@@ -0,0 +1,121 @@
+import logging
+import os
+import shutil
+import threading
+
+import pytest
+import yaml
+
+from pytorch3dunet.unet3d import config
+from pytorch3dunet.unet3d.config import _load_config_cached, _load_config_yaml
+from tests.conftest import TEST_FILES
+
+
+@pytest.fixture
+def config_file(tmpdir):
+    path = os.path.join(tmpdir, 'config_train.yml')
+    shutil.copy(os.path.join(TEST_FILES, 'config_train.yml'), path)
+    return path
+
+
+def _fail_on_yaml_load(config_file):
+    raise AssertionError(f"'{config_file}' should have been loaded from the cache")
+
+
+class TestConfigCache:
+    def test_cache_created(self, config_file):
+        expected = yaml.safe_load(open(config_file, 'r'))
+        assert _load_config_cached(config_file) == expected
+        assert os.path.isfile(config_file + '.cache.json')
+
+    def test_cache_hit(self, config_file, monkeypatch):
+        expected = _load_config_cached(config_file)
+        monkeypatch.setattr(config, '_load_config_yaml', _fail_on_yaml_load)
+        assert _load_config_cached(config_file) == expected
+
+    def test_cache_invalidated_when_mtime_preserved(self, config_file):
+        _load_config_cached(config_file)
+        stat = os.stat(config_file)
+        with open(config_file, 'a') as f:
+            f.write('\nextra_key: 1\n')
+        # simulate e.g. `cp -p` or `rsync -a`, which keep the original modification time
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        assert _load_config_cached(config_file)['extra_key'] == 1
+
+    def test_cache_invalidated_when_mtime_changes(self, config_file):
+        expected = _load_config_cached(config_file)
+        stat = os.stat(config_file)
+        # same content and size, different modification time
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        with open(config_file + '.cache.json', 'r') as f:
+            cached = f.read()
+        with open(config_file + '.cache.json', 'w') as f:
+            f.write(cached.replace('"CrossEntropyLoss"', '"DiceLoss"'))
+
+        assert _load_config_cached(config_file) == expected
+
+    def test_corrupted_cache(self, config_file):
+        expected = yaml.safe_load(open(config_file, 'r'))
+        with open(config_file + '.cache.json', 'w') as f:
+            f.write('{"source": ')
+
+        assert _load_config_cached(config_file) == expected
+        # the corrupted cache gets replaced
+        with open(config_file + '.cache.json', 'r') as f:
+            assert f.read().startswith('{"source": {')
+
+    def test_unwritable_cache(self, config_file, caplog):
+        expected = yaml.safe_load(open(config_file, 'r'))
+        # a directory in place of the cache file can be neither read nor written (even by root)
+        os.mkdir(config_file + '.cache.json')
+
+        with caplog.at_level(logging.WARNING, logger='ConfigLoader'):
+            assert _load_config_cached(config_file) == expected
+        assert 'Could not cache config' in caplog.text
+
+    def test_fifo_not_cached(self, tmpdir, caplog):
+        config_path = os.path.join(tmpdir, 'config.yml')
+        os.mkfifo(config_path)
+
+        def _write_config():
+            with open(config_path, 'w') as f:
+                f.write('device: cpu\n')
+
+        writer = threading.Thread(target=_write_config)
+        writer.start()
+        try:
+            with caplog.at_level(logging.WARNING, logger='ConfigLoader'):
+                assert _load_config_cached(config_path) == {'device': 'cpu'}
+        finally:
+            writer.join()
+        assert not os.path.exists(config_path + '.cache.json')
+        assert 'Could not cache config' not in caplog.text
+
+
+class TestYamlLoader:
+    def test_same_as_safe_load(self):
+        config_path = os.path.join(TEST_FILES, 'config_train.yml')
+        assert _load_config_yaml(config_path) == yaml.safe_load(open(config_path, 'r'))
+
+    def test_dates_load_as_strings(self, tmpdir):
+        config_path = os.path.join(tmpdir, 'config.yml')
+        with open(config_path, 'w') as f:
+            f.write('d: 2020-01-01\n')
+        assert _load_config_yaml(config_path) == {'d': '2020-01-01'}
+
+    def test_empty_file(self, tmpdir):
+        config_path = os.path.join(tmpdir, 'config.yml')
+        open(config_path, 'w').close()
+        assert _load_config_yaml(config_path) is None
+
+    def test_pipe(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            os.write(write_fd, b'device: cpu\nmodel: {name: UNet3D}\n')
+            os.close(write_fd)
+            # e.g. `train3dunet --config <(envsubst < config.yml)`
+            config_path = f'/dev/fd/{read_fd}'
+            assert _load_config_yaml(config_path) == {'device': 'cpu', 'model': {'name': 'UNet3D'}}
+        finally:
+            os.close(read_fd)
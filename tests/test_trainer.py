@@ -3,6 +3,7 @@ from tempfile import NamedTemporaryFile
 
 import h5py
 import numpy as np
+import pytest
 import torch
 
 from pytorch3dunet.datasets.utils import get_train_loaders
@@ -39,19 +40,26 @@ class TestUNet3DTrainer:
         with capsys.disabled():
             assert_train_save_load(tmpdir, train_config, 'CrossEntropyLoss', 'MeanIoU', 'ResidualUNet3D')
 
+    @pytest.mark.skipif(not hasattr(torch, 'compile'), reason='torch.compile requires PyTorch 2.0+')
+    def test_compile_forward(self, tmpdir, capsys, train_config):
+        with capsys.disabled():
+            assert_train_save_load(tmpdir, train_config, 'CrossEntropyLoss', 'MeanIoU', 'UNet3D',
+                                   compile_forward=True)
+
     def test_2d_unet(self, tmpdir, capsys, train_config_2d):
         with capsys.disabled():
             assert_train_save_load(tmpdir, train_config_2d, 'CrossEntropyLoss', 'MeanIoU', 'UNet2D',
                                    shape=(3, 1, 128, 128))
 
 
-def assert_train_save_load(tmpdir, train_config, loss, val_metric, model, weight_map=False, shape=(3, 64, 64, 64)):
+def assert_train_save_load(tmpdir, train_config, loss, val_metric, model, weight_map=False, shape=(3, 64, 64, 64),
+                           compile_forward=False):
     max_num_epochs = train_config['trainer']['max_num_epochs']
     log_after_iters = train_config['trainer']['log_after_iters']
     validate_after_iters = train_config['trainer']['validate_after_iters']
     max_num_iterations = train_config['trainer']['max_num_iterations']
 
-    trainer = _train_save_load(tmpdir, train_config, loss, val_metric, model, weight_map, shape)
+    trainer = _train_save_load(tmpdir, train_config, loss, val_metric, model, weight_map, shape, compile_forward)
 
     assert trainer.num_iterations == max_num_iterations
     assert trainer.max_num_epochs == max_num_epochs
@@ -60,7 +68,7 @@ def assert_train_save_load(tmpdir, train_config, loss, val_metric, model, weight
     assert trainer.max_num_iterations == max_num_iterations
 
 
-def _train_save_load(tmpdir, train_config, loss, val_metric, model, weight_map, shape):
+def _train_save_load(tmpdir, train_config, loss, val_metric, model, weight_map, shape, compile_forward=False):
     binary_loss = loss in ['BCEWithLogitsLoss', 'DiceLoss', 'BCEDiceLoss', 'GeneralizedDiceLoss']
 
     device = torch.device("cuda:0" if torch.cuda.is_available() else 'cpu')
@@ -105,7 +113,8 @@ def _train_save_load(tmpdir, train_config, loss, val_metric, model, weight_map,
                             log_after_iters=train_config['trainer']['log_after_iters'],
                             validate_after_iters=train_config['trainer']['log_after_iters'],
                             max_num_iterations=train_config['trainer']['max_num_iterations'],
-                            tensorboard_formatter=formatter)
+                            tensorboard_formatter=formatter,
+                            compile_forward=compile_forward)
     trainer.fit()
     # test loading the trainer from the checkpoint
     trainer = UNet3DTrainer(model, optimizer, lr_scheduler,